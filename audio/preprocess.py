@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+from math import gcd
+
+import numpy as np
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SAMPLE_RATE, AUDIO_GAIN_NORMALIZATION, AUDIO_TARGET_RMS, AUDIO_GATE_RMS
+
+# Cruces por cero del sinc a cada lado del centro (más = banda de transición más estrecha, más CPU)
+_ZERO_CROSSINGS = 10
+# Corte bajo la frecuencia de Nyquist de salida para que la banda de transición no produzca aliasing
+_CUTOFF = 0.9
+_MAX_GAIN = 4.0
+_GAIN_SMOOTHING = 0.2
+_PEAK_LIMIT = 32000
+
+
+def _design_filter(up, down, zero_crossings=_ZERO_CROSSINGS, cutoff=_CUTOFF):
+    """Filtro pasa bajos (sinc con ventana Kaiser) separado en `up` fases.
+
+    Retorna una matriz (up, taps_per_phase) donde la fila p contiene h[p + k*up].
+    """
+    factor = max(up, down)
+    taps_per_phase = -(-2 * zero_crossings * factor // up)  # División redondeando hacia arriba
+    num_taps = up * taps_per_phase
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    h = cutoff / factor * np.sinc(cutoff / factor * n) * np.kaiser(num_taps, 8.0)
+    # Ganancia `up` para compensar los ceros insertados al sobremuestrear
+    h *= up / h.sum()
+    return h.reshape(taps_per_phase, up).T.astype(np.float32)
+
+
+class PolyphaseResampler:
+    """Remuestreo racional up/down con estado entre bloques (sin saltos en los bordes)"""
+
+    def __init__(self, input_rate, output_rate):
+        g = gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // g
+        self.down = int(input_rate) // g
+        self.phases = _design_filter(self.up, self.down)
+        self.taps = self.phases.shape[1]
+        # Historial con las últimas muestras necesarias por el filtro
+        self.history = np.zeros(self.taps - 1, dtype=np.float32)
+        self.history_start = -(self.taps - 1)  # Índice global de history[0]
+        self.next_output = 0  # Índice global de la próxima muestra de salida
+        self._tap_offsets = np.arange(self.taps)
+
+    def process(self, samples):
+        buf = np.concatenate((self.history, samples))
+        buf_end = self.history_start + len(buf)  # Índice global siguiente a la última muestra
+
+        # Salidas m cuya muestra de entrada más reciente i = (m*down)//up ya está disponible
+        last_output = (buf_end * self.up - 1) // self.down
+        outputs = np.arange(self.next_output, last_output + 1, dtype=np.int64)
+        if len(outputs):
+            positions = outputs * self.down
+            base = positions // self.up - self.history_start
+            phase = positions % self.up
+            # Matriz (M, taps) con x[i], x[i-1], ... x[i-taps+1] para cada salida
+            window = buf[base[:, None] - self._tap_offsets]
+            result = np.einsum("ij,ij->i", window, self.phases[phase])
+            self.next_output = int(outputs[-1]) + 1
+        else:
+            result = np.zeros(0, dtype=np.float32)
+
+        keep = self.taps - 1
+        self.history = buf[-keep:] if keep else buf[:0]
+        self.history_start = buf_end - keep
+        return result
+
+
+class AudioPreprocessor:
+    """Convierte bloques int16 del micrófono a int16 mono a SAMPLE_RATE para Vosk"""
+
+    def __init__(self, input_rate, channels=1, output_rate=SAMPLE_RATE,
+                 normalize=AUDIO_GAIN_NORMALIZATION, target_rms=AUDIO_TARGET_RMS, gate_rms=AUDIO_GATE_RMS):
+        self.input_rate = int(input_rate)
+        self.channels = channels
+        self.output_rate = output_rate
+        self.normalize = normalize
+        self.target_rms = target_rms
+        self.gate_rms = gate_rms
+        self.gain = 1.0
+        self.resampler = None
+        if self.input_rate != output_rate:
+            self.resampler = PolyphaseResampler(self.input_rate, output_rate)
+
+    @property
+    def passthrough(self):
+        return self.resampler is None and self.channels == 1 and not self.normalize
+
+    def process(self, data):
+        """Procesa un bloque de bytes int16 intercalados y retorna bytes int16 mono"""
+        if self.passthrough:
+            return data
+
+        samples = np.frombuffer(data, dtype=np.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        else:
+            samples = samples.astype(np.float32)
+
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+
+        if self.normalize and len(samples):
+            samples = self._apply_gain(samples)
+
+        return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+    def _apply_gain(self, samples):
+        """Control automático de ganancia: sube despacio con voz, baja de inmediato"""
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        peak = float(np.abs(samples).max())
+        # Los bloques de ruido o silencio no ajustan la ganancia (evita amplificar el ambiente)
+        if rms >= self.gate_rms:
+            target_gain = min(_MAX_GAIN, self.target_rms / rms)
+            if target_gain < self.gain:
+                self.gain = target_gain
+            else:
+                self.gain += (target_gain - self.gain) * _GAIN_SMOOTHING
+        # Nunca recortar el pico del bloque actual
+        if peak * self.gain > _PEAK_LIMIT:
+            self.gain = _PEAK_LIMIT / peak
+        return samples * self.gain
+
+
+def block_size_for(rate, latency):
+    """Tamaño de bloque (en cuadros) para una latencia objetivo en segundos"""
+    return max(256, int(rate * latency))
+
+
+def benchmark_preprocessing(seconds=30):
+    """Mide el tiempo de CPU por segundo de audio para distintas configuraciones"""
+    # Sin ganancia es la configuración por defecto; con ganancia se mide el costo del AGC
+    configs = [
+        (16000, 1, False),
+        (16000, 1, True),
+        (44100, 1, False),
+        (44100, 2, False),
+        (44100, 1, True),
+        (48000, 1, False),
+        (48000, 2, False),
+        (48000, 1, True),
+    ]
+    latencies = (0.1, 0.25, 0.5)
+    rng = np.random.default_rng(0)
+
+    print(f"Audio sintético: {seconds}s por configuración\n")
+    print(f"{'Entrada':>14} {'Canales':>8} {'Ganancia':>9} {'Bloque':>8} {'CPU ms/s audio':>15}")
+    for rate, channels, normalize in configs:
+        t = np.arange(rate * seconds) / rate
+        signal = 3000 * np.sin(2 * np.pi * 440 * t) + rng.normal(0, 500, len(t))
+        interleaved = np.repeat(signal, channels).clip(-32768, 32767).astype(np.int16).tobytes()
+        frame_bytes = 2 * channels
+
+        for latency in latencies:
+            preprocessor = AudioPreprocessor(rate, channels, normalize=normalize)
+            block_bytes = block_size_for(rate, latency) * frame_bytes
+            start = time.process_time()
+            for offset in range(0, len(interleaved), block_bytes):
+                preprocessor.process(interleaved[offset:offset + block_bytes])
+            cpu_ms = (time.process_time() - start) * 1000 / seconds
+            print(f"{rate:>11} Hz {channels:>8} {'sí' if normalize else 'no':>9} "
+                  f"{int(latency * 1000):>6}ms {cpu_ms:>15.2f}")
+
+    print()
+    for rate in (44100, 48000):
+        print(f"Aliasing de un tono de 9 kHz a {rate} Hz -> {SAMPLE_RATE} Hz: {measure_aliasing(rate):.0f} dB")
+
+
+def measure_aliasing(input_rate, tone_hz=9000, reference_hz=1000, seconds=2):
+    """Atenuación (dB) de un tono sobre la frecuencia de Nyquist de salida frente a uno en banda"""
+    t = np.arange(int(input_rate * seconds)) / input_rate
+    levels = []
+    for freq in (tone_hz, reference_hz):
+        output = PolyphaseResampler(input_rate, SAMPLE_RATE).process(
+            (8000 * np.sin(2 * np.pi * freq * t)).astype(np.float32))
+        output = output[SAMPLE_RATE // 10:]  # Descartar el arranque del filtro
+        levels.append(float(np.sqrt(np.mean(output * output))))
+    return 20 * np.log10(max(levels[0], 1e-9) / levels[1])
+
+
+if __name__ == "__main__":
+    benchmark_preprocessing()
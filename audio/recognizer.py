@@ -1,8 +1,24 @@
 import queue
 import json
+import time
+import socket
+import threading
 import sounddevice as sd
-from vosk import Model, KaldiRecognizer
-from config import VOSK_MODEL_PATH
+from vosk import Model
+from config import (
+    VOSK_MODEL_PATH,
+    VOSK_SERVER_SOCKET,
+    SAMPLE_RATE,
+    AUDIO_INPUT_DEVICE,
+    AUDIO_INPUT_RATE,
+    AUDIO_LATENCY_TARGET,
+)
+from audio.vosk_server import send_frame, recv_frame, build_recognizer, MSG_AUDIO, MSG_GRAMMAR
+from audio.preprocess import AudioPreprocessor, block_size_for
+
+# Espera entre intentos de reconexión con el servidor Vosk (se duplica hasta el máximo)
+_RECONNECT_MIN_DELAY = 0.5
+_RECONNECT_MAX_DELAY = 30.0
 
 class VoskRecognizer:
     def __init__(self):
@@ -13,6 +29,8 @@ class VoskRecognizer:
         self.initialized = False
         self.listening = False
         self.paused = False
+        self.grammar = None
+        self.preprocessor = None
     
     def _callback(self, indata, frames, time, status):
         if status:
@@ -26,7 +44,7 @@ class VoskRecognizer:
         try:
             print("Cargando modelo Vosk...")
             self.model = Model(VOSK_MODEL_PATH)
-            self.recognizer = KaldiRecognizer(self.model, 16000)
+            self.recognizer = build_recognizer(self.model, self.grammar)
             print("Modelo Vosk cargado exitosamente.")
             self.initialized = True
             return True
@@ -34,27 +52,74 @@ class VoskRecognizer:
             print(f"Error inicializando Vosk: {e}")
             return False
     
+    def set_grammar(self, phrases):
+        """Restringe el reconocimiento a `phrases` (None o lista vacía = vocabulario libre)"""
+        self.grammar = list(phrases) if phrases else None
+        if self.model is not None:
+            # Se construye el nuevo reconocedor antes de reemplazar la referencia
+            self.recognizer = build_recognizer(self.model, self.grammar)
+            print("Gramática del reconocedor actualizada.")
+    
+    def _input_formats(self):
+        """Combinaciones (frecuencia, canales) a probar, empezando por la nativa del micrófono"""
+        device = sd.query_devices(AUDIO_INPUT_DEVICE, "input")
+        native_rate = AUDIO_INPUT_RATE or int(device["default_samplerate"])
+        formats = [(native_rate, 1)]
+        # Algunos micrófonos USB solo abren en estéreo
+        if device["max_input_channels"] > 1:
+            formats.append((native_rate, min(2, device["max_input_channels"])))
+        if native_rate != SAMPLE_RATE:
+            formats.append((SAMPLE_RATE, 1))
+        return formats
+    
     def start_listening(self):
         """Inicia el stream de audio"""
         if not self.initialized:
             raise RuntimeError("Vosk no está inicializado. Llama a initialize() primero.")
         
         try:
-            self.stream = sd.RawInputStream(
-                samplerate=16000, 
-                blocksize=8000, 
-                dtype='int16',
-                channels=1, 
-                callback=self._callback
-            )
-            self.stream.start()
-            self.listening = True
-            self.paused = False
-            print("Escuchando continuamente con Vosk...")
-            return True
+            formats = self._input_formats()
         except Exception as e:
-            print(f"Error iniciando stream de audio: {e}")
-            return False
+            print(f"No se pudo consultar el micrófono, usando {SAMPLE_RATE} Hz: {e}")
+            formats = [(SAMPLE_RATE, 1)]
+        
+        for rate, channels in formats:
+            try:
+                self.stream = sd.RawInputStream(
+                    samplerate=rate, 
+                    blocksize=block_size_for(rate, AUDIO_LATENCY_TARGET), 
+                    device=AUDIO_INPUT_DEVICE,
+                    dtype='int16',
+                    channels=channels, 
+                    callback=self._callback
+                )
+                # El remuestreo y la mezcla de canales se hacen en listen_command, no en el callback
+                self.preprocessor = AudioPreprocessor(rate, channels)
+                self.stream.start()
+                self.listening = True
+                self.paused = False
+                print(f"Escuchando continuamente con Vosk ({rate} Hz, {channels} canal(es))...")
+                return True
+            except Exception as e:
+                print(f"Error iniciando stream de audio a {rate} Hz, {channels} canal(es): {e}")
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+        return False
+    
+    def _next_block(self):
+        """Toma todos los bloques acumulados en la cola y los convierte a mono a SAMPLE_RATE.
+
+        Se procesan juntos para que el consumo nunca quede por detrás del micrófono,
+        aunque los bloques sean más cortos que la pausa del bucle de escucha.
+        """
+        blocks = [self.q.get_nowait()]
+        while True:
+            try:
+                blocks.append(self.q.get_nowait())
+            except queue.Empty:
+                break
+        return self.preprocessor.process(b"".join(blocks))
     
     def stop_listening(self):
         """Detiene el stream de audio"""
@@ -94,7 +159,7 @@ class VoskRecognizer:
             return None
         
         try:
-            data = self.q.get_nowait()
+            data = self._next_block()
             if self.recognizer.AcceptWaveform(data):
                 result = json.loads(self.recognizer.Result())
                 text = result.get("text", "").strip().lower()
@@ -108,8 +173,129 @@ class VoskRecognizer:
         
         return None
 
+class VoskClientRecognizer(VoskRecognizer):
+    """Reconocedor que delega la decodificación al servidor Vosk compartido"""
+
+    def __init__(self, socket_path):
+        super().__init__()
+        self.socket_path = socket_path
+        self.sock = None
+        self._sock_lock = threading.Lock()
+        self._reconnect_delay = _RECONNECT_MIN_DELAY
+        self._next_reconnect = 0.0
+
+    def _connect(self):
+        """Abre la sesión con el servidor y le envía la gramática vigente (llamar con _sock_lock)"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            if self.grammar:
+                self._send_grammar(sock)
+        except Exception:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def _send_grammar(self, sock):
+        send_frame(sock, MSG_GRAMMAR, json.dumps(self.grammar or [], ensure_ascii=False).encode("utf-8"))
+        if recv_frame(sock)[0] is None:
+            raise ConnectionError("el servidor Vosk cerró la conexión")
+
+    def _disconnect(self):
+        """Cierra la sesión rota; el siguiente listen_command intentará reconectar"""
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        self._next_reconnect = time.monotonic() + self._reconnect_delay
+
+    def _reconnect(self):
+        """Reintenta la conexión con espera exponencial. Retorna True si hay sesión abierta"""
+        if self.sock is not None:
+            return True
+        if time.monotonic() < self._next_reconnect:
+            return False
+        try:
+            self._connect()
+        except OSError as e:
+            self._reconnect_delay = min(_RECONNECT_MAX_DELAY, self._reconnect_delay * 2)
+            self._next_reconnect = time.monotonic() + self._reconnect_delay
+            print(f"Servidor Vosk no disponible ({e}); reintento en {self._reconnect_delay:.0f}s")
+            return False
+        self._reconnect_delay = _RECONNECT_MIN_DELAY
+        print("Reconectado al servidor Vosk.")
+        return True
+
+    def initialize(self):
+        """Conecta con el servidor Vosk en lugar de cargar el modelo localmente"""
+        try:
+            print(f"Conectando con servidor Vosk en {self.socket_path}...")
+            with self._sock_lock:
+                self._connect()
+            print("Conectado al servidor Vosk.")
+            self.initialized = True
+            return True
+        except Exception as e:
+            print(f"Error conectando con servidor Vosk: {e}")
+            self.sock = None
+            return False
+
+    def set_grammar(self, phrases):
+        """Envía la nueva gramática al servidor para esta sesión (y en cada reconexión)"""
+        self.grammar = list(phrases) if phrases else None
+        with self._sock_lock:
+            if self.sock is None:
+                return
+            try:
+                self._send_grammar(self.sock)
+                print("Gramática del servidor Vosk actualizada.")
+            except OSError as e:
+                print(f"Error actualizando gramática en servidor Vosk: {e}")
+                self._disconnect()
+
+    def stop_listening(self):
+        """Detiene el stream de audio y cierra la sesión con el servidor"""
+        super().stop_listening()
+        with self._sock_lock:
+            if self.sock:
+                self.sock.close()
+                self.sock = None
+
+    def listen_command(self):
+        """Escucha un comando de voz usando el servidor compartido"""
+        if not self.initialized or not self.stream or self.paused:
+            return None
+
+        try:
+            data = self._next_block()
+            with self._sock_lock:
+                # Sin servidor el audio se descarta: al volver se empieza con audio reciente
+                if not self._reconnect():
+                    return None
+                try:
+                    send_frame(self.sock, MSG_AUDIO, data)
+                    msg_type, payload = recv_frame(self.sock)
+                    if msg_type is None:
+                        raise ConnectionError("el servidor Vosk cerró la conexión")
+                except OSError as e:
+                    print(f"Conexión con el servidor Vosk perdida: {e}")
+                    self._disconnect()
+                    return None
+            text = json.loads(payload).get("text", "").strip().lower()
+            if text:
+                print(f"Detectado: {text}")
+                return text
+        except queue.Empty:
+            pass
+        except Exception as e:
+            print(f"Error en reconocimiento: {e}")
+
+        return None
+
 # Instancia global del reconocedor
-recognizer_instance = VoskRecognizer()
+if VOSK_SERVER_SOCKET:
+    recognizer_instance = VoskClientRecognizer(VOSK_SERVER_SOCKET)
+else:
+    recognizer_instance = VoskRecognizer()
 
 def initialize_recognizer():
     """Inicializa el reconocedor de voz"""
@@ -131,6 +317,10 @@ def resume_listening():
     """Reanuda la escucha de comandos"""
     recognizer_instance.resume_listening()
 
+def set_grammar(phrases):
+    """Actualiza la gramática del reconocedor sin recargar el modelo"""
+    recognizer_instance.set_grammar(phrases)
+
 def listen_command():
     """Función de compatibilidad para escuchar comandos"""
     return recognizer_instance.listen_command()
\ No newline at end of file
@@ -1,8 +1,39 @@
+import re
 import subprocess
-import os
 import requests
-from pathlib import Path
-from config import TTS_OUTPUT_FILE, OPENAI_API_KEY, OPENAI_TTS_VOICE
+from config import OPENAI_API_KEY, OPENAI_API_BASE, OPENAI_TTS_VOICE, TTS_DEADLINE, TTS_CHUNK_CHARS
+from utils.temp_files import temp_manager
+from utils.scheduler import scheduler
+
+# Textos hasta este largo usan su propio historial de latencias (frases cortas del asistente)
+_SHORT_TEXT_CHARS = 120
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?:;])\s+|\n+")
+
+def split_text(text, max_chars=TTS_CHUNK_CHARS):
+    """Divide el texto en fragmentos de hasta `max_chars`, cortando en finales de frase"""
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        # Frases más largas que el límite se cortan entre palabras
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
 
 def speak(text):
     """Convierte texto a voz usando OpenAI TTS"""
@@ -15,12 +46,26 @@ def speak(text):
         print(f"[Error] No hay clave API de OpenAI configurada. Texto: {text}")
         return
     
-    _speak_with_openai(text)
+    # Por partes: cada petición tiene un tamaño acotado, así el plazo y el hedging
+    # sirven igual para una frase corta que para una página completa
+    for chunk in split_text(text):
+        if not _speak_with_openai(chunk):
+            # La API no respondió a tiempo o está caída: usar la voz local
+            _speak_with_system(chunk)
+
+def _speak_with_system(text):
+    """Usar espeak como voz local de respaldo"""
+    try:
+        subprocess.run(["espeak", "-v", "es", text], check=True)
+    except FileNotFoundError:
+        print(f"[TTS local] espeak no disponible. Texto: {text}")
+    except subprocess.CalledProcessError as e:
+        print(f"[TTS local] Error: {e}")
 
 def _speak_with_openai(text):
-    """Usar OpenAI TTS para generar voz"""
+    """Usar OpenAI TTS para generar voz. Retorna False si se debe usar el respaldo local"""
     try:
-        url = "https://api.openai.com/v1/audio/speech"
+        url = f"{OPENAI_API_BASE}/audio/speech"
         headers = {
             "Authorization": f"Bearer {OPENAI_API_KEY}",
             "Content-Type": "application/json",
@@ -33,37 +78,42 @@ def _speak_with_openai(text):
             "response_format": "mp3"
         }
         
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        response = scheduler.call(
+            "openai-tts" if len(text) <= _SHORT_TEXT_CHARS else "openai-tts-long",
+            lambda timeout: requests.post(url, headers=headers, json=data, timeout=timeout),
+            TTS_DEADLINE,
+            breaker="openai",
+        )
         
         if response.status_code == 200:
-            output_file = str(TTS_OUTPUT_FILE).replace('.wav', '.mp3')
-            
-            with open(output_file, 'wb') as f:
-                f.write(response.content)
-            
-            # Reproducir el archivo de audio en Raspberry Pi
-            try:
-                subprocess.run(["mpg123", output_file], check=True)
-            except FileNotFoundError:
-                # Fallback a ffplay si mpg123 no está disponible
+            # Nombre único en RAM: llamadas concurrentes no se sobrescriben
+            with temp_manager.create(".mp3", expected_size=len(response.content)) as artifact:
+                output_file = str(artifact.path)
+                
+                with open(output_file, 'wb') as f:
+                    f.write(response.content)
+                
+                # Reproducir el archivo de audio en Raspberry Pi
                 try:
-                    subprocess.run(["ffplay", "-nodisp", "-autoexit", output_file], check=True)
+                    subprocess.run(["mpg123", output_file], check=True)
                 except FileNotFoundError:
-                    # Último fallback: convertir a wav y usar aplay
-                    wav_file = output_file.replace('.mp3', '.wav')
-                    subprocess.run(["ffmpeg", "-i", output_file, wav_file], check=True)
-                    subprocess.run(["aplay", wav_file], check=True)
-                    os.remove(wav_file)
-            
-            # Limpiar archivo temporal
-            try:
-                os.remove(output_file)
-            except OSError:
-                pass
+                    # Fallback a ffplay si mpg123 no está disponible
+                    try:
+                        subprocess.run(["ffplay", "-nodisp", "-autoexit", output_file], check=True)
+                    except FileNotFoundError:
+                        # Último fallback: convertir a wav y usar aplay (WAV ocupa ~10 veces más que MP3)
+                        with temp_manager.create(".wav", expected_size=len(response.content) * 10) as wav_artifact:
+                            wav_file = str(wav_artifact.path)
+                            subprocess.run(["ffmpeg", "-i", output_file, wav_file], check=True)
+                            subprocess.run(["aplay", wav_file], check=True)
+            return True
         else:
             print(f"[OpenAI-TTS Error] Error {response.status_code}: {response.text}")
+            return False
                 
     except requests.exceptions.RequestException as e:
         print(f"[OpenAI-TTS Error] Error de conexión: {e}")
+        return False
     except Exception as e:
-        print(f"[OpenAI-TTS Error] Error inesperado: {e}")
\ No newline at end of file
+        print(f"[OpenAI-TTS Error] Error inesperado: {e}")
+        return False
\ No newline at end of file
@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import wave
+import socket
+import struct
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vosk import Model, KaldiRecognizer
+from config import VOSK_MODEL_PATH, VOSK_SERVER_SOCKET, VOSK_SERVER_WORKERS, SAMPLE_RATE
+
+# Protocolo: cada mensaje es [tipo (1 byte)][longitud (4 bytes, big-endian)][payload]
+MSG_AUDIO = b"A"   # Bloque de audio PCM int16 mono
+MSG_RESET = b"R"   # Descartar la frase en curso
+MSG_GRAMMAR = b"G" # Nueva gramática (lista JSON de frases, vacía = sin gramática)
+MSG_RESULT = b"T"  # Respuesta del servidor (JSON)
+
+_HEADER = struct.Struct(">cI")
+
+
+def send_frame(sock, msg_type, payload=b""):
+    """Envía un mensaje con cabecera de tipo y longitud"""
+    sock.sendall(_HEADER.pack(msg_type, len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    """Lee exactamente `size` bytes o retorna None si se cerró la conexión"""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_frame(sock):
+    """Recibe un mensaje completo. Retorna (tipo, payload) o (None, None) al cerrar"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None, None
+    msg_type, length = _HEADER.unpack(header)
+    payload = _recv_exact(sock, length) if length else b""
+    if payload is None:
+        return None, None
+    return msg_type, payload
+
+
+class _SessionHandler(socketserver.BaseRequestHandler):
+    """Atiende una sesión de reconocimiento: un KaldiRecognizer por conexión"""
+
+    def handle(self):
+        server = self.server
+        recognizer = build_recognizer(server.model)
+        server.session_opened()
+        try:
+            while True:
+                msg_type, payload = recv_frame(self.request)
+                if msg_type is None:
+                    break
+
+                if msg_type == MSG_AUDIO:
+                    # La decodificación se ejecuta en el pool para limitar el uso de CPU
+                    result = server.pool.submit(_decode, recognizer, payload).result()
+                    send_frame(self.request, MSG_RESULT, json.dumps(result).encode("utf-8"))
+                elif msg_type == MSG_RESET:
+                    recognizer.Reset()
+                    send_frame(self.request, MSG_RESULT, b"{}")
+                elif msg_type == MSG_GRAMMAR:
+                    recognizer = build_recognizer(server.model, json.loads(payload))
+                    send_frame(self.request, MSG_RESULT, b"{}")
+                else:
+                    print(f"Mensaje desconocido en servidor Vosk: {msg_type!r}")
+                    break
+        except (ConnectionError, OSError) as e:
+            print(f"Sesión Vosk terminada: {e}")
+        finally:
+            server.session_closed()
+
+
+def build_recognizer(model, phrases=None):
+    """Crea un KaldiRecognizer, opcionalmente restringido a una lista de frases"""
+    if phrases:
+        # "[unk]" permite que el audio fuera de la gramática no se fuerce a un comando
+        return KaldiRecognizer(model, SAMPLE_RATE, json.dumps(list(phrases) + ["[unk]"], ensure_ascii=False))
+    return KaldiRecognizer(model, SAMPLE_RATE)
+
+
+def _decode(recognizer, data):
+    """Alimenta un bloque de audio al reconocedor y retorna el resultado final si existe"""
+    if recognizer.AcceptWaveform(data):
+        return json.loads(recognizer.Result())
+    return {}
+
+
+def _remove_stale_socket(socket_path):
+    """Elimina un socket que quedó de una ejecución anterior; falla si otro servidor lo usa"""
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(socket_path)
+            return
+    raise RuntimeError(f"Ya hay un servidor Vosk escuchando en {socket_path}")
+
+
+class VoskServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor local que carga el modelo Vosk una sola vez y lo comparte entre procesos"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=VOSK_SERVER_SOCKET, model_path=VOSK_MODEL_PATH, workers=VOSK_SERVER_WORKERS):
+        self.socket_path = socket_path
+        # Antes de cargar el modelo: no tiene sentido esperar si otro servidor ya está activo
+        _remove_stale_socket(socket_path)
+        print("Cargando modelo Vosk compartido...")
+        self.model = Model(model_path)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.sessions = 0
+        self._sessions_lock = threading.Lock()
+
+        super().__init__(socket_path, _SessionHandler)
+        print(f"Servidor Vosk escuchando en {socket_path} ({workers} workers)")
+
+    def session_opened(self):
+        with self._sessions_lock:
+            self.sessions += 1
+
+    def session_closed(self):
+        with self._sessions_lock:
+            self.sessions -= 1
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+
+def _current_rss_mb():
+    """RSS actual del proceso en MB (Linux) con fallback al pico de getrusage"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_streams(wav_path, stream_counts=(1, 4, 8), socket_path="/tmp/vosk_bench.sock"):
+    """Mide RSS y velocidad de decodificación por stream con 1, 4 y 8 sesiones simultáneas"""
+    with wave.open(wav_path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"El audio de prueba debe ser mono int16 a {SAMPLE_RATE} Hz")
+        audio = wf.readframes(wf.getnframes())
+    audio_seconds = len(audio) / 2 / SAMPLE_RATE
+    block_bytes = 8000 * 2
+
+    rss_before = _current_rss_mb()
+    server = VoskServer(socket_path=socket_path)
+    rss_model = _current_rss_mb()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def run_stream(elapsed, index):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            start = time.perf_counter()
+            for offset in range(0, len(audio), block_bytes):
+                send_frame(sock, MSG_AUDIO, audio[offset:offset + block_bytes])
+                recv_frame(sock)
+            elapsed[index] = time.perf_counter() - start
+
+    print(f"\nAudio de prueba: {audio_seconds:.1f}s | RSS base: {rss_before:.0f} MB | con modelo: {rss_model:.0f} MB")
+    try:
+        for count in stream_counts:
+            elapsed = [0.0] * count
+            threads = [threading.Thread(target=run_stream, args=(elapsed, i)) for i in range(count)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            avg = sum(elapsed) / count
+            print(f"{count} stream(s): {audio_seconds / avg:.1f}x tiempo real por stream | "
+                  f"RSS: {_current_rss_mb():.0f} MB")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--benchmark":
+        benchmark_streams(sys.argv[2])
+    else:
+        if not VOSK_SERVER_SOCKET:
+            print("Configura VOSK_SERVER_SOCKET para iniciar el servidor Vosk")
+            sys.exit(1)
+        try:
+            vosk_server = VoskServer()
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        try:
+            vosk_server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServidor Vosk detenido")
+        finally:
+            vosk_server.server_close()
@@ -7,6 +7,7 @@ load_dotenv()
 
 # Configuración de API
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
 
 # Configuración de TTS (solo OpenAI)
 OPENAI_TTS_VOICE = os.getenv("OPENAI_TTS_VOICE", "alloy")  # Opciones: alloy, echo, fable, onyx, nova, shimmer 
@@ -14,12 +15,19 @@ OPENAI_TTS_VOICE = os.getenv("OPENAI_TTS_VOICE", "alloy")  # Opciones: alloy, ec
 # Configuración de modelos
 VOSK_MODEL_PATH = os.path.expanduser("./models/vosk-model-small-es-0.42")
 
+# Servidor Vosk compartido (opcional): si se define el socket, el asistente usa el
+# modelo cargado por `python audio/vosk_server.py` en lugar de cargar su propia copia
+VOSK_SERVER_SOCKET = os.getenv("VOSK_SERVER_SOCKET", "")
+VOSK_SERVER_WORKERS = int(os.getenv("VOSK_SERVER_WORKERS", str(os.cpu_count() or 1)))
+
 # Configuración de archivos temporales
 TEMP_DIR = Path.cwd() / "temp"
 TEMP_DIR.mkdir(exist_ok=True)
-
-# Configuración de TTS
-TTS_OUTPUT_FILE = TEMP_DIR / "output.wav"
+# Archivos pequeños en RAM (tmpfs) para evitar escrituras en la tarjeta SD
+TEMP_RAM_DIR = os.getenv("TEMP_RAM_DIR", "/dev/shm")  # Vacío = usar solo TEMP_DIR
+TEMP_RAM_THRESHOLD = int(os.getenv("TEMP_RAM_THRESHOLD", str(4 * 1024 * 1024)))  # Tamaño máximo por archivo en RAM
+TEMP_RAM_BUDGET = int(os.getenv("TEMP_RAM_BUDGET", str(64 * 1024 * 1024)))  # Total de bytes en RAM
+IMAGE_EXPECTED_SIZE = 2 * 1024 * 1024  # Tamaño estimado de una captura JPEG
 
 # Configuración de cámara
 DEFAULT_IMAGE_FILENAME = TEMP_DIR / "captured_image.jpg"
@@ -27,10 +35,66 @@ DEFAULT_IMAGE_FILENAME = TEMP_DIR / "captured_image.jpg"
 # 0 = sin rotación, 90 = 90° horario, 180 = boca abajo, 270 = 90° antihorario
 CAMERA_ROTATION = int(os.getenv("CAMERA_ROTATION", "0"))
 
+# Configuración de lectura continua (varias páginas)
+READING_SAMPLE_INTERVAL = float(os.getenv("READING_SAMPLE_INTERVAL", "0.5"))  # Segundos entre capturas
+READING_IDLE_TIMEOUT = float(os.getenv("READING_IDLE_TIMEOUT", "20"))  # Termina sin páginas nuevas
+READING_PAGE_CHANGE_THRESHOLD = float(os.getenv("READING_PAGE_CHANGE_THRESHOLD", "0.25"))  # Fracción de tinta distinta
+READING_MAX_PAGES = int(os.getenv("READING_MAX_PAGES", "50"))  # 0 = sin límite
+
+# Configuración de OCR
+OCR_MODEL = "gpt-4.1-mini"
+OCR_TILE_MAX_HEIGHT = int(os.getenv("OCR_TILE_MAX_HEIGHT", "1200"))  # Páginas más altas se dividen en fragmentos
+OCR_TILE_OVERLAP = 80  # Píxeles compartidos entre fragmentos para no cortar líneas
+OCR_MIN_TOKENS = 128
+OCR_MAX_TOKENS = 4096
+OCR_DEFAULT_TOKENS = 500  # Sin OpenCV no se puede estimar la densidad de texto
+# Precios en USD por millón de tokens (para reportar el costo de cada lectura)
+OCR_PRICE_INPUT_PER_1M = float(os.getenv("OCR_PRICE_INPUT_PER_1M", "0.40"))
+OCR_PRICE_OUTPUT_PER_1M = float(os.getenv("OCR_PRICE_OUTPUT_PER_1M", "1.60"))
+
+# Configuración de descripción de escenas
+SCENE_MODEL = "gpt-4.1-mini"
+SCENE_IMAGE_MAX_SIDE = 512  # Suficiente para el modo de detalle bajo de la API
+SCENE_MIN_BRIGHTNESS = int(os.getenv("SCENE_MIN_BRIGHTNESS", "40"))  # Brillo medio mínimo (0-255)
+SCENE_MIN_SHARPNESS = float(os.getenv("SCENE_MIN_SHARPNESS", "60"))  # Varianza mínima del Laplaciano
+SCENE_SIMILARITY_THRESHOLD = 4  # Bits distintos (de 64) para considerar la escena sin cambios
+SCENE_MAX_BLOCK_DIFF = 0.45  # Diferencia máxima por zona de la miniatura (en desviaciones estándar)
+SCENE_CACHE_SIZE = 16
+SCENE_CACHE_TTL = int(os.getenv("SCENE_CACHE_TTL", "60"))  # Segundos que una descripción sigue vigente
+
 # Configuración de reconocimiento de voz
 SAMPLE_RATE = 16000
 BLOCK_SIZE = 8000
+# Captura a la frecuencia nativa del micrófono y remuestreo a SAMPLE_RATE en el hilo de trabajo
+AUDIO_INPUT_DEVICE = os.getenv("AUDIO_INPUT_DEVICE", "").strip() or None  # Nombre o índice de sounddevice
+if AUDIO_INPUT_DEVICE and AUDIO_INPUT_DEVICE.isdigit():
+    AUDIO_INPUT_DEVICE = int(AUDIO_INPUT_DEVICE)  # sounddevice trata un texto como nombre, no como índice
+AUDIO_INPUT_RATE = int(os.getenv("AUDIO_INPUT_RATE", "0"))  # 0 = frecuencia nativa del dispositivo
+AUDIO_LATENCY_TARGET = float(os.getenv("AUDIO_LATENCY_TARGET", str(BLOCK_SIZE / SAMPLE_RATE)))  # Segundos por bloque
+AUDIO_GAIN_NORMALIZATION = os.getenv("AUDIO_GAIN_NORMALIZATION", "false").lower() == "true"  # Solo micrófonos muy bajos
+AUDIO_TARGET_RMS = 3000  # Nivel RMS (int16) al que se normaliza la voz
+AUDIO_GATE_RMS = int(os.getenv("AUDIO_GATE_RMS", "300"))  # Por debajo es ruido: no se ajusta la ganancia
+# Restringir Vosk a las frases de commands.json (más preciso, menos flexible)
+VOSK_USE_GRAMMAR = os.getenv("VOSK_USE_GRAMMAR", "false").lower() == "true"
+
+# Configuración de comandos
+COMMANDS_FILE = "commands.json"
+COMMANDS_RELOAD_INTERVAL = float(os.getenv("COMMANDS_RELOAD_INTERVAL", "2"))  # Segundos entre revisiones
 
 # Tiempos de espera
 INTERNET_CHECK_TIMEOUT = 3
-API_REQUEST_TIMEOUT = 30
\ No newline at end of file
+API_REQUEST_TIMEOUT = 30
+
+# Presupuestos de latencia para llamadas a la nube (segundos)
+COMMAND_LATENCY_BUDGET = float(os.getenv("COMMAND_LATENCY_BUDGET", "60"))  # Total por comando
+TTS_DEADLINE = float(os.getenv("TTS_DEADLINE", "8"))  # Por fragmento de texto
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "400"))  # Textos largos se sintetizan por partes
+OCR_DEADLINE = float(os.getenv("OCR_DEADLINE", "20"))
+SCENE_DEADLINE = float(os.getenv("SCENE_DEADLINE", "15"))
+
+# Planificador de peticiones: hedging y circuit breaker
+SCHEDULER_MAX_WORKERS = 8
+HEDGE_DEFAULT_DELAY = 3.0  # Antes de tener suficientes muestras de latencia
+HEDGE_MIN_DELAY = 1.0
+BREAKER_FAILURE_THRESHOLD = 3  # Fallos seguidos para abrir el circuito
+BREAKER_RESET_TIMEOUT = 30  # Segundos antes de volver a probar el servicio
\ No newline at end of file
@@ -1,125 +1,109 @@
-import json
-import os
 import threading
-import difflib
 import sys
 import time
-from pathlib import Path
 
-from audio.recognizer import initialize_recognizer, start_listening, stop_listening, listen_command, pause_listening, resume_listening
+from audio.recognizer import initialize_recognizer, start_listening, stop_listening, listen_command, pause_listening, resume_listening, set_grammar
 from audio.speaker import speak
 from vision.camera import take_picture
 from vision.ocr import ocr_image
+from vision.reader import read_continuous
+from vision.describe import describe_scene
 from utils.internet import check_internet
-from config import TEMP_DIR
+from utils.command_registry import CommandRegistry
+from utils.temp_files import temp_manager
+from utils.scheduler import scheduler
+from config import VOSK_USE_GRAMMAR, IMAGE_EXPECTED_SIZE
 
 command_lock = threading.Lock()
+registry = CommandRegistry()
 
-def get_best_command_match(text, command_aliases, cutoff=0.6):
-    """Encuentra la mejor coincidencia de comando usando búsqueda difusa"""
-    if not text or not command_aliases:
-        return None
+@registry.register("read_document")
+def read_document():
+    """Toma una foto del documento y lee su texto"""
+    # El archivo se elimina al salir del bloque, aunque ocurra un error
+    with temp_manager.create(".jpg", expected_size=IMAGE_EXPECTED_SIZE) as image:
+        speak("Tomando foto del documento...")
+        filename = take_picture(image.path)
         
-    # Normalizar el texto de entrada
-    text = text.lower().strip()
-    
-    all_phrases = {
-        alias.lower(): action
-        for action, aliases in command_aliases.items()
-        for alias in aliases
-    }
-    
-    match = difflib.get_close_matches(text, all_phrases.keys(), n=1, cutoff=cutoff)
-    return all_phrases[match[0]] if match else None
+        if not filename:
+            speak("No pude tomar la foto del documento.")
+            return
+        
+        # Verificar conexión
+        if not check_internet():
+            speak("Sin conexión a internet.")
+        else:
+            speak("Procesando documento con inteligencia artificial.")
+        
+        text = ocr_image(filename)
+        if text and text.strip():
+            speak(f"El documento dice: {text}")
+        else:
+            speak("No pude leer texto en el documento.")
+        
+        speak("Comando completado. Puedes dar otro comando o decir 'salir' para terminar.")
 
-def load_commands_from_file(file_path="commands.json"):
-    """Carga comandos desde archivo JSON o retorna comandos por defecto"""
-    try:
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                commands = json.load(f)
-                if not isinstance(commands, dict):
-                    raise ValueError("El archivo de comandos debe contener un diccionario")
-                # Validar que cada comando tenga una lista de aliases
-                for action, aliases in commands.items():
-                    if not isinstance(aliases, list) or not aliases:
-                        raise ValueError(f"El comando '{action}' debe tener una lista no vacía de aliases")
-                return commands
-    except (json.JSONDecodeError, ValueError, FileNotFoundError) as e:
-        print(f"Error cargando comandos desde {file_path}: {e}")
-        print("Usando comandos por defecto...")
-    
-    # Comandos por defecto simplificados para Raspberry Pi
-    return {
-        "read_document": [
-            "leer documento", "quiero que leas", "puedes leer esto",
-            "lee esto", "lee el documento", "leer texto"
-        ],
-        "exit": ["salir", "terminar", "adiós", "bye", "cerrar"]
-    }
+# Sin presupuesto global: la lectura puede durar minutos y cada página tiene el suyo
+@registry.register("read_continuous", budget=None)
+def read_continuous_pages():
+    """Lee varias páginas seguidas con la cámara"""
+    if not check_internet():
+        speak("Sin conexión a internet.")
+        return
 
-def cleanup_temp_file(filename):
-    """Limpia archivos temporales de manera segura"""
-    if filename and os.path.exists(filename):
-        try:
-            os.remove(filename)
-            print(f"Archivo temporal eliminado: {filename}")
-        except OSError as e:
-            print(f"No se pudo eliminar archivo temporal {filename}: {e}")
+    speak("Lectura continua. Coloca cada página frente a la cámara.")
+    pages = read_continuous(speak)
+    speak(f"Lectura terminada. Páginas leídas: {pages}.")
+
+@registry.register("describe_scene")
+def describe_surroundings():
+    """Toma una foto del entorno y la describe"""
+    with temp_manager.create(".jpg", expected_size=IMAGE_EXPECTED_SIZE) as image:
+        speak("Observando el entorno...")
+        filename = take_picture(image.path)
+        
+        if not filename:
+            speak("No pude tomar la foto del entorno.")
+            return
+        
+        speak(describe_scene(filename))
+
+@registry.register("exit")
+def exit_assistant():
+    """Termina el asistente"""
+    speak("Hasta luego.")
+    stop_listening()
+    registry.stop_watching()
+    cleanup_temp_files()
+    sys.exit(0)
 
 def handle_command(action):
     """Maneja la ejecución de comandos con bloqueo para evitar concurrencia"""
-    filename = None
     try:
         with command_lock:
             # Pausar la escucha mientras se procesa el comando
             pause_listening()
             
-            if action == "read_document":
-                speak("Tomando foto del documento...")
-                filename = take_picture()
-                
-                if not filename:
-                    speak("No pude tomar la foto del documento.")
-                    return
-                
-                # Verificar conexión
-                if not check_internet():
-                    speak("Sin conexión a internet.")
-                else:
-                    speak("Procesando documento con inteligencia artificial.")
-                
-                text = ocr_image(filename)
-                if text and text.strip():
-                    speak(f"El documento dice: {text}")
-                else:
-                    speak("No pude leer texto en el documento.")
-                
-                speak("Comando completado. Puedes dar otro comando o decir 'salir' para terminar.")
-
-            elif action == "exit":
-                speak("Hasta luego.")
-                stop_listening()
-                cleanup_temp_files()
-                sys.exit(0)
+            handler = registry.handler_for(action)
+            if handler:
+                # Las llamadas a la nube del comando comparten un presupuesto de latencia
+                with scheduler.budget(registry.budget_for(action)):
+                    handler()
+            else:
+                print(f"Comando sin handler registrado: {action}")
+                speak("Ese comando todavía no está disponible.")
                 
     except Exception as e:
         print(f"Error ejecutando comando {action}: {e}")
         speak("Ocurrió un error ejecutando el comando.")
     finally:
-        # Siempre limpiar el archivo temporal
-        if filename:
-            cleanup_temp_file(filename)
         # Reanudar la escucha al finalizar el comando
         resume_listening()
 
 def cleanup_temp_files():
     """Limpia todos los archivos temporales al salir"""
     try:
-        for file_path in TEMP_DIR.glob("*"):
-            if file_path.is_file():
-                file_path.unlink()
-        print("Archivos temporales limpiados.")
+        temp_manager.cleanup_all()
     except Exception as e:
         print(f"Error limpiando archivos temporales: {e}")
 
@@ -133,10 +117,14 @@ def main():
         print(f"Configuración - TTS: OpenAI")
         
         # Cargar comandos
-        known_commands = load_commands_from_file()
-        if not known_commands:
+        if not registry.commands:
             print("Error: No se pudieron cargar los comandos")
             return
+        
+        # Mantener la gramática del reconocedor sincronizada con commands.json
+        if VOSK_USE_GRAMMAR:
+            set_grammar(registry.phrases())
+            registry.on_reload(lambda commands: set_grammar(registry.phrases()))
 
         # Inicializar reconocedor de voz
         print("Inicializando reconocedor de voz...")
@@ -149,6 +137,9 @@ def main():
         if not start_listening():
             print("Error: No se pudo iniciar la escucha de audio")
             return
+        
+        # Recargar commands.json en caliente sin reiniciar el modelo Vosk
+        registry.start_watching()
 
         def listen_loop():
             """Bucle principal de escucha de comandos"""
@@ -160,7 +151,7 @@ def main():
                     command_text = listen_command()
                     if command_text:
                         print(f"Comando detectado: {command_text}")
-                        action = get_best_command_match(command_text, known_commands)
+                        action = registry.match(command_text)
                         
                         if action:
                             if command_lock.locked():
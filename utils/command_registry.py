@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import difflib
+import threading
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import COMMANDS_FILE, COMMANDS_RELOAD_INTERVAL, COMMAND_LATENCY_BUDGET
+
+# Comandos por defecto simplificados para Raspberry Pi
+DEFAULT_COMMANDS = {
+    "read_document": [
+        "leer documento", "quiero que leas", "puedes leer esto",
+        "lee esto", "lee el documento", "leer texto"
+    ],
+    "read_continuous": [
+        "lectura continua", "leer varias páginas", "leer páginas",
+        "leer carta completa"
+    ],
+    "describe_scene": [
+        "describir escena", "qué ves", "descríbeme el lugar",
+        "describe la imagen", "qué hay aquí", "dime qué ves"
+    ],
+    "exit": ["salir", "terminar", "adiós", "bye", "cerrar"]
+}
+
+
+def read_commands(file_path):
+    """Lee y valida el archivo de comandos. Lanza excepción si es inválido"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        commands = json.load(f)
+    if not isinstance(commands, dict):
+        raise ValueError("El archivo de comandos debe contener un diccionario")
+    # Validar que cada comando tenga una lista de aliases
+    for action, aliases in commands.items():
+        if not isinstance(aliases, list) or not aliases:
+            raise ValueError(f"El comando '{action}' debe tener una lista no vacía de aliases")
+    return commands
+
+
+def load_commands_from_file(file_path=COMMANDS_FILE):
+    """Carga comandos desde archivo JSON o retorna comandos por defecto"""
+    try:
+        if os.path.exists(file_path):
+            return read_commands(file_path)
+    except (json.JSONDecodeError, ValueError, FileNotFoundError) as e:
+        print(f"Error cargando comandos desde {file_path}: {e}")
+        print("Usando comandos por defecto...")
+
+    return DEFAULT_COMMANDS
+
+
+class CommandIndex:
+    """Índice inmutable de frases compilado a partir de un diccionario de comandos"""
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.phrases = {
+            alias.lower().strip(): action
+            for action, aliases in commands.items()
+            for alias in aliases
+        }
+        self.phrase_list = list(self.phrases)
+
+    def match(self, text, cutoff=0.6):
+        # Coincidencia exacta primero, búsqueda difusa solo si hace falta
+        action = self.phrases.get(text)
+        if action:
+            return action
+        match = difflib.get_close_matches(text, self.phrase_list, n=1, cutoff=cutoff)
+        return self.phrases[match[0]] if match else None
+
+
+class CommandRegistry:
+    """Registro de comandos con handlers tipo plugin y recarga en caliente de commands.json"""
+
+    def __init__(self, file_path=COMMANDS_FILE):
+        self.file_path = file_path
+        self.handlers = {}
+        self.budgets = {}
+        self.reload_listeners = []
+        self.index = CommandIndex(load_commands_from_file(file_path))
+        self.last_reload_ms = 0.0
+        self._mtime = self._current_mtime()
+        self._reload_lock = threading.Lock()
+        self._watch_thread = None
+        self._stop_event = threading.Event()
+
+    def register(self, action, budget=COMMAND_LATENCY_BUDGET):
+        """Decorador para registrar el handler de una acción.
+
+        `budget` es el presupuesto de latencia para las llamadas a la nube del comando;
+        None para comandos largos que lo administran por partes.
+        """
+        def decorator(func):
+            self.handlers[action] = func
+            self.budgets[action] = budget
+            return func
+        return decorator
+
+    def on_reload(self, callback):
+        """Registra una función que recibe el nuevo diccionario de comandos tras cada recarga"""
+        self.reload_listeners.append(callback)
+        return callback
+
+    @property
+    def commands(self):
+        return self.index.commands
+
+    def match(self, text, cutoff=0.6):
+        """Busca la acción correspondiente al texto usando el índice vigente"""
+        if not text:
+            return None
+        # Leer la referencia una sola vez: una recarga concurrente no afecta esta búsqueda
+        index = self.index
+        return index.match(text.lower().strip(), cutoff)
+
+    def handler_for(self, action):
+        return self.handlers.get(action)
+
+    def budget_for(self, action):
+        return self.budgets.get(action, COMMAND_LATENCY_BUDGET)
+
+    def phrases(self):
+        """Frases conocidas, útiles para la gramática del reconocedor"""
+        return list(self.index.phrase_list)
+
+    def reload(self):
+        """Recompila el índice desde el archivo. Mantiene el anterior si el archivo es inválido"""
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                commands = read_commands(self.file_path)
+            except (OSError, json.JSONDecodeError, ValueError) as e:
+                print(f"Error recargando comandos desde {self.file_path}: {e}")
+                print("Se mantienen los comandos actuales.")
+                return False
+
+            # Reemplazo atómico: los lectores ven el índice anterior o el nuevo, nunca uno parcial
+            self.index = CommandIndex(commands)
+            for callback in self.reload_listeners:
+                try:
+                    callback(commands)
+                except Exception as e:
+                    print(f"Error notificando recarga de comandos: {e}")
+            self.last_reload_ms = (time.perf_counter() - start) * 1000
+
+        print(f"Comandos recargados: {list(commands.keys())} ({self.last_reload_ms:.1f} ms)")
+        return True
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check_for_changes(self):
+        """Recarga si el archivo cambió desde la última revisión"""
+        mtime = self._current_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        return self.reload()
+
+    def start_watching(self, interval=COMMANDS_RELOAD_INTERVAL):
+        """Inicia un hilo que revisa el mtime de commands.json periódicamente"""
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+
+        def watch_loop():
+            while not self._stop_event.wait(interval):
+                self.check_for_changes()
+
+        self._stop_event.clear()
+        self._watch_thread = threading.Thread(target=watch_loop, daemon=True)
+        self._watch_thread.start()
+        print(f"Vigilando cambios en {self.file_path} cada {interval}s")
+
+    def stop_watching(self):
+        self._stop_event.set()
+
+
+def test_concurrent_reload(iterations=200):
+    """Prueba de recarga concurrente: busca comandos mientras se reescribe el archivo"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "commands.json")
+        variants = [
+            {"read_document": ["leer documento"], "exit": ["salir"]},
+            {"read_document": ["leer documento", "lee esto"], "exit": ["salir", "adiós"]},
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(variants[0], f)
+
+        registry = CommandRegistry(path)
+        errors = []
+        stop = threading.Event()
+
+        def matcher():
+            while not stop.is_set():
+                try:
+                    # Estas frases existen en ambas versiones del archivo
+                    assert registry.match("leer documento") == "read_document"
+                    assert registry.match("salir") == "exit"
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=matcher) for _ in range(4)]
+        for t in threads:
+            t.start()
+
+        latencies = []
+        for i in range(iterations):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(variants[i % 2], f)
+            os.replace(tmp_path, path)
+            registry.reload()
+            latencies.append(registry.last_reload_ms)
+
+        stop.set()
+        for t in threads:
+            t.join()
+
+    latencies.sort()
+    print(f"Recargas: {iterations} | p50: {latencies[len(latencies) // 2]:.2f} ms | "
+          f"p95: {latencies[int(len(latencies) * 0.95)]:.2f} ms")
+    if errors:
+        print(f"❌ {len(errors)} errores de coincidencia durante la recarga: {errors[0]!r}")
+        return False
+    print("✅ Sin errores de coincidencia durante la recarga concurrente")
+    return True
+
+
+def _wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_watcher_reload(interval=0.05, timeout=2.0):
+    """Prueba la recarga en caliente real: reescribe el archivo y espera a que el hilo vigilante
+    reemplace el índice y notifique a los listeners (p. ej. la gramática del reconocedor)"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "commands.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"read_document": ["leer documento"], "exit": ["salir"]}, f)
+
+        registry = CommandRegistry(path)
+        grammars = []
+        registry.on_reload(lambda commands: grammars.append(CommandIndex(commands).phrase_list))
+        registry.start_watching(interval)
+        ok = True
+        try:
+            start = time.perf_counter()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"read_document": ["leer documento", "lee esto"], "exit": ["salir"]}, f)
+            os.replace(tmp_path, path)
+            # Asegurar un mtime distinto aunque el sistema de archivos tenga poca resolución
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+            if _wait_for(lambda: registry.match("lee esto", cutoff=1.0) == "read_document", timeout):
+                print(f"Índice reemplazado por el vigilante en {(time.perf_counter() - start) * 1000:.0f} ms")
+            else:
+                print(f"❌ El vigilante no recargó el archivo en {timeout}s")
+                ok = False
+            if not grammars or "lee esto" not in grammars[-1]:
+                print("❌ El listener de recarga no recibió las frases nuevas")
+                ok = False
+
+            # Un archivo inválido no debe reemplazar el índice vigente
+            reloads = len(grammars)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{inválido")
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+            time.sleep(interval * 5)
+            if registry.match("lee esto", cutoff=1.0) != "read_document" or len(grammars) != reloads:
+                print("❌ Un archivo inválido reemplazó los comandos vigentes")
+                ok = False
+        finally:
+            registry.stop_watching()
+
+    if ok:
+        print("✅ Recarga en caliente por el hilo vigilante correcta")
+    return ok
+
+
+if __name__ == "__main__":
+    results = [test_concurrent_reload(), test_watcher_reload()]
+    sys.exit(0 if all(results) else 1)
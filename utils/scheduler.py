@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque, Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    SCHEDULER_MAX_WORKERS,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MIN_DELAY,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+)
+
+# Se heredan de RequestException para que los manejadores existentes las capturen
+class CircuitOpenError(requests.exceptions.RequestException):
+    """El servicio está marcado como no disponible; se falla de inmediato"""
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """No se obtuvo respuesta dentro del presupuesto de latencia"""
+
+
+class CircuitBreaker:
+    """Abre el circuito tras varios fallos seguidos y deja pasar una prueba tras el enfriamiento"""
+
+    CLOSED = "cerrado"
+    OPEN = "abierto"
+    HALF_OPEN = "semiabierto"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("🟢 Circuito cerrado: el servicio respondió de nuevo")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_abandoned(self):
+        """La llamada se cortó por el presupuesto del comando: no dice nada sobre el servicio"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"🔴 Circuito abierto tras {self.failures} fallo(s); se usarán alternativas locales")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class _Budget:
+    """Segundos de espera a la nube que le quedan a un bloque `budget()` (y a los que lo contienen)"""
+
+    def __init__(self, seconds, parent=None):
+        self.parent = parent
+        self.remaining = seconds if parent is None else min(seconds, parent.remaining)
+
+    def charge(self, seconds):
+        budget = self
+        while budget is not None:
+            budget.remaining -= seconds
+            budget = budget.parent
+
+
+class RequestScheduler:
+    """Ejecuta llamadas a servicios en la nube con plazos, peticiones duplicadas (hedging)
+    y un circuit breaker por servicio.
+
+    Las latencias y el retraso del hedging se miden por endpoint (`name`); varios endpoints
+    del mismo proveedor pueden compartir un circuit breaker (`breaker`).
+    """
+
+    def __init__(self, max_workers=SCHEDULER_MAX_WORKERS, hedging=True):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.hedging = hedging
+        self.breakers = {}
+        self.latencies = {}
+        self.stats = {}
+        self.breaker_names = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _service(self, name, breaker_name=None):
+        breaker_name = breaker_name or name
+        with self._lock:
+            if breaker_name not in self.breakers:
+                self.breakers[breaker_name] = CircuitBreaker()
+            if name not in self.latencies:
+                self.latencies[name] = deque(maxlen=100)
+                self.stats[name] = Counter()
+                self.breaker_names[name] = breaker_name
+            return self.breakers[breaker_name], self.latencies[name], self.stats[name]
+
+    @contextmanager
+    def budget(self, seconds):
+        """Limita el tiempo total que las llamadas hechas en este hilo dentro del bloque esperan a la nube.
+
+        Solo se descuenta el tiempo dentro de `call()`: la reproducción del audio y el
+        trabajo local no consumen presupuesto. Con `seconds=None` no se impone presupuesto
+        (comandos largos que lo administran por partes).
+        """
+        if seconds is None:
+            yield
+            return
+        previous = getattr(self._local, "budget", None)
+        self._local.budget = _Budget(seconds, previous)
+        try:
+            yield
+        finally:
+            self._local.budget = previous
+
+    def hedge_delay(self, name):
+        """Espera antes de lanzar una petición duplicada: p95 de las latencias recientes"""
+        with self._lock:
+            samples = sorted(self.latencies.get(name, ()))
+        if len(samples) < 5:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, samples[int(len(samples) * 0.95) - 1])
+
+    @staticmethod
+    def _is_failure(response):
+        status = getattr(response, "status_code", 200)
+        return status >= 500 or status == 429
+
+    def call(self, name, func, timeout, breaker=None, hedge=True):
+        """Ejecuta `func(timeout)` respetando el plazo; retorna la primera respuesta válida.
+
+        `hedge=False` desactiva la petición duplicada (p. ej. subidas costosas que se cobran dos veces).
+        """
+        budget = getattr(self._local, "budget", None)
+        start = time.monotonic()
+        try:
+            return self._call(name, func, timeout, breaker, hedge, budget, start)
+        finally:
+            if budget is not None:
+                budget.charge(time.monotonic() - start)
+
+    def _call(self, name, func, timeout, breaker_name, hedge, budget, start):
+        breaker, latencies, stats = self._service(name, breaker_name)
+        stats["calls"] += 1
+
+        # El plazo viene del presupuesto del comando si queda menos que el timeout propio de la llamada
+        budget_limited = budget is not None and budget.remaining < timeout
+        deadline = start + (budget.remaining if budget_limited else timeout)
+        if deadline <= start:
+            stats["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"Sin presupuesto de tiempo para '{name}'")
+
+        if not breaker.allow():
+            stats["short_circuited"] += 1
+            raise CircuitOpenError(f"Servicio '{name}' no disponible temporalmente")
+
+        hedge_at = start + self.hedge_delay(name)
+        attempts = {self.executor.submit(func, deadline - start): 0}
+        pending = set(attempts)
+        last_error = None
+        last_response = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            can_hedge = self.hedging and hedge and len(attempts) == 1
+            wait_until = min(deadline, hedge_at) if can_hedge else deadline
+            done, pending = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if self._is_failure(response):
+                    last_response = response
+                    continue
+                latencies.append(time.monotonic() - start)
+                breaker.record_success()
+                stats["successes"] += 1
+                if attempts[future] == 1:
+                    stats["hedge_wins"] += 1
+                return response
+
+            # Lanzar una petición duplicada si la primera tarda más que el p95
+            if can_hedge and pending and time.monotonic() >= hedge_at:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    hedge_future = self.executor.submit(func, remaining)
+                    attempts[hedge_future] = 1
+                    pending.add(hedge_future)
+                    stats["hedges"] += 1
+
+        # El timeout de `requests` suele vencer justo antes que el plazo del planificador:
+        # un Timeout sin respuestas de error también es "no respondió a tiempo"
+        timed_out = bool(pending) or last_response is None and (
+            last_error is None or isinstance(last_error, requests.exceptions.Timeout)
+        )
+        if timed_out and budget_limited:
+            # Se acabó el presupuesto del comando: no cuenta como fallo del servicio
+            breaker.record_abandoned()
+            stats["budget_exhausted"] += 1
+            raise DeadlineExceeded(f"Presupuesto agotado esperando a '{name}' ({deadline - start:.1f}s)")
+
+        breaker.record_failure()
+        stats["failures"] += 1
+        if timed_out:
+            stats["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"'{name}' no respondió en {deadline - start:.1f}s")
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def summary(self):
+        """Contadores y latencias por servicio"""
+        report = {}
+        with self._lock:
+            names = list(self.stats)
+        for name in names:
+            breaker, latencies, stats = self._service(name, self.breaker_names[name])
+            samples = sorted(latencies)
+            report[name] = dict(stats)
+            report[name]["circuit"] = breaker.state
+            if samples:
+                report[name]["p50"] = round(samples[len(samples) // 2], 3)
+                report[name]["p95"] = round(samples[max(0, int(len(samples) * 0.95) - 1)], 3)
+        return report
+
+
+# Instancia global compartida por TTS, OCR y descripción de escenas
+scheduler = RequestScheduler()
+
+
+def test_with_fault_injection(port=8766):
+    """Prueba el planificador contra un servidor local que inyecta lentitud y errores"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    mode = {"value": "ok"}
+    counter = Counter()
+
+    class FaultyHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            counter["requests"] += 1
+            if mode["value"] == "down":
+                self.send_response(503)
+                self.end_headers()
+                return
+            # En modo "slow" una de cada dos peticiones se queda colgada
+            if mode["value"] == "slow" and counter["requests"] % 2 == 0:
+                time.sleep(5)
+            else:
+                time.sleep(0.05)
+            body = json.dumps({"ok": True}).encode("utf-8")
+            try:
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except BrokenPipeError:
+                # El cliente ya abandonó esta petición (plazo vencido o ganó la duplicada)
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), FaultyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{port}/"
+    test_scheduler = RequestScheduler()
+    test_scheduler._service("stub")[0].reset_timeout = 1.0
+
+    def post(timeout):
+        return requests.post(url, json={}, timeout=timeout)
+
+    def run(label, calls, timeout):
+        start = time.perf_counter()
+        results = Counter()
+        for _ in range(calls):
+            try:
+                results[test_scheduler.call("stub", post, timeout).status_code] += 1
+            except requests.exceptions.RequestException as e:
+                results[type(e).__name__] += 1
+        print(f"{label}: {dict(results)} en {time.perf_counter() - start:.2f}s")
+
+    try:
+        run("Servicio sano", 10, 2.0)
+        mode["value"] = "slow"
+        run("Servicio lento (hedging)", 10, 2.0)
+        mode["value"] = "down"
+        run("Servicio caído (circuit breaker)", 10, 2.0)
+        mode["value"] = "ok"
+        time.sleep(1.1)
+        run("Recuperación", 3, 2.0)
+        with test_scheduler.budget(0.0):
+            run("Presupuesto agotado", 1, 2.0)
+        # Un presupuesto que corta llamadas lentas no debe abrir el circuito
+        mode["value"] = "slow"
+        for _ in range(BREAKER_FAILURE_THRESHOLD + 1):
+            with test_scheduler.budget(0.5):
+                run("Presupuesto corto con servicio lento", 2, 2.0)
+        print(f"Circuito tras cortes por presupuesto: {test_scheduler.breakers['stub'].state}")
+    finally:
+        server.shutdown()
+
+    summary = test_scheduler.summary()
+    print(f"\nContadores: {summary}")
+    # Solo las respuestas 503 del servicio caído cuentan como fallos
+    if summary["stub"].get("failures", 0) != BREAKER_FAILURE_THRESHOLD:
+        print("❌ Los cortes por presupuesto se contaron como fallos del servicio")
+        return False
+    print("✅ Los cortes por presupuesto no cuentan como fallos")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_with_fault_injection() else 1)
@@ -0,0 +1,222 @@
+import os
+import re
+import sys
+import uuid
+import atexit
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TEMP_DIR, TEMP_RAM_DIR, TEMP_RAM_THRESHOLD, TEMP_RAM_BUDGET
+
+
+PROCESS_DIR_PREFIX = "assistive_ai_"
+# Nombres de artefactos (uuid4 en hexadecimal) sueltos en TEMP_DIR, de versiones sin directorio por proceso
+_LOOSE_ARTIFACT_RE = re.compile(r"^[0-9a-f]{32}(\.\w+)?$")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Existe, pero pertenece a otro usuario
+    return True
+
+
+def remove_stale_dirs(root):
+    """Elimina directorios assistive_ai_<pid>_* propios cuyo proceso ya terminó"""
+    try:
+        entries = list(Path(root).glob(f"{PROCESS_DIR_PREFIX}*"))
+    except OSError:
+        return
+    for entry in entries:
+        pid = entry.name[len(PROCESS_DIR_PREFIX):].split("_", 1)[0]
+        if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+            continue
+        try:
+            if entry.is_dir() and entry.stat().st_uid == os.getuid():
+                shutil.rmtree(entry, ignore_errors=True)
+                print(f"Eliminado directorio temporal huérfano: {entry}")
+        except OSError:
+            pass
+
+
+def remove_loose_artifacts(root):
+    """Elimina archivos temporales sueltos (nombre uuid) que dejaron versiones anteriores"""
+    try:
+        entries = [p for p in Path(root).iterdir() if _LOOSE_ARTIFACT_RE.match(p.name) and p.is_file()]
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            entry.unlink()
+        except OSError:
+            pass
+    if entries:
+        print(f"Eliminados {len(entries)} archivos temporales huérfanos en {root}")
+
+
+class Artifact:
+    """Archivo temporal con nombre único y tiempo de vida por conteo de referencias"""
+
+    def __init__(self, manager, path, in_ram=False, owned=True, expected_size=0):
+        self.manager = manager
+        self.path = Path(path)
+        self.in_ram = in_ram
+        self.owned = owned
+        self.expected_size = expected_size
+        self.refs = 1
+
+    def __str__(self):
+        return str(self.path)
+
+    def __fspath__(self):
+        return str(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def size(self):
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+    def reserved(self):
+        """Bytes que ocupa o puede llegar a ocupar (aunque aún no se haya escrito)"""
+        return max(self.expected_size, self.size())
+
+    def acquire(self):
+        """Agrega una referencia (p. ej. al pasar el archivo a otro hilo)"""
+        self.manager._acquire(self)
+        return self
+
+    def release(self):
+        """Quita una referencia; el archivo se elimina cuando nadie lo usa"""
+        self.manager._release(self)
+
+
+class TempArtifactManager:
+    """Gestiona archivos temporales: RAM (tmpfs) para los pequeños, disco para el resto.
+
+    Cada archivo recibe un nombre único para que operaciones concurrentes no se
+    sobrescriban, y los archivos en RAM respetan un presupuesto total de bytes.
+    """
+
+    def __init__(self, disk_dir=TEMP_DIR, ram_dir=TEMP_RAM_DIR,
+                 ram_threshold=TEMP_RAM_THRESHOLD, ram_budget=TEMP_RAM_BUDGET):
+        self.disk_root = Path(disk_dir)
+        self.ram_threshold = ram_threshold
+        self.ram_budget = ram_budget
+        self.ram_root = ram_dir if ram_dir and os.path.isdir(ram_dir) else None
+        # Los directorios propios (en disco y en RAM) se crean al primer uso, no al importar el módulo
+        self.disk_dir = None
+        self.ram_dir = None
+        self._lock = threading.Lock()
+        self._live = set()
+        atexit.register(self._remove_process_dirs)
+
+    def create(self, suffix="", expected_size=0):
+        """Reserva un archivo temporal único. El llamador debe liberarlo con release()"""
+        name = f"{uuid.uuid4().hex}{suffix}"
+        with self._lock:
+            in_ram = self._fits_in_ram(expected_size)
+            directory = self.ram_dir if in_ram else self._ensure_disk_dir()
+            artifact = Artifact(self, directory / name, in_ram=in_ram, expected_size=expected_size)
+            self._live.add(artifact)
+        return artifact
+
+    def wrap(self, path):
+        """Envuelve un archivo existente que no pertenece al gestor (nunca se elimina)"""
+        return Artifact(self, path, owned=False)
+
+    def ram_usage(self):
+        """Bytes reservados en RAM por los artefactos vivos"""
+        return sum(a.reserved() for a in list(self._live) if a.in_ram)
+
+    def _fits_in_ram(self, expected_size):
+        if self.ram_root is None or expected_size > self.ram_threshold:
+            return False
+        if self.ram_usage() + expected_size > self.ram_budget:
+            return False
+        return self._ensure_ram_dir()
+
+    @staticmethod
+    def _make_process_dir(root):
+        """Directorio propio por proceso (con su PID) para no interferir con otras instancias.
+
+        Antes de crearlo se eliminan los de procesos que terminaron sin limpiar (caídas, kill).
+        """
+        remove_stale_dirs(root)
+        return Path(tempfile.mkdtemp(prefix=f"{PROCESS_DIR_PREFIX}{os.getpid()}_", dir=root))
+
+    def _ensure_ram_dir(self):
+        if self.ram_dir is not None:
+            return True
+        try:
+            self.ram_dir = self._make_process_dir(self.ram_root)
+        except OSError as e:
+            print(f"No se pudo crear el directorio temporal en {self.ram_root}: {e}")
+            self.ram_root = None
+            return False
+        return True
+
+    def _ensure_disk_dir(self):
+        if self.disk_dir is None:
+            self.disk_root.mkdir(parents=True, exist_ok=True)
+            remove_loose_artifacts(self.disk_root)
+            self.disk_dir = self._make_process_dir(self.disk_root)
+        return self.disk_dir
+
+    def _remove_process_dirs(self):
+        for directory in (self.ram_dir, self.disk_dir):
+            if directory is not None:
+                shutil.rmtree(directory, ignore_errors=True)
+        self.ram_dir = None
+        self.disk_dir = None
+
+    def _acquire(self, artifact):
+        with self._lock:
+            artifact.refs += 1
+
+    def _release(self, artifact):
+        with self._lock:
+            if artifact.refs <= 0:
+                return
+            artifact.refs -= 1
+            if artifact.refs > 0:
+                return
+            self._live.discard(artifact)
+            self._delete(artifact)
+
+    def _delete(self, artifact):
+        if not artifact.owned:
+            return
+        try:
+            artifact.path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"No se pudo eliminar archivo temporal {artifact.path}: {e}")
+
+    def cleanup_all(self):
+        """Elimina todos los archivos del gestor al salir"""
+        with self._lock:
+            for artifact in list(self._live):
+                self._delete(artifact)
+            self._live.clear()
+            self._remove_process_dirs()
+        print("Archivos temporales limpiados.")
+
+
+# Instancia global del gestor
+temp_manager = TempArtifactManager()
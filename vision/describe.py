@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+import requests
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_API_BASE,
+    SCENE_MODEL,
+    SCENE_DEADLINE,
+    SCENE_IMAGE_MAX_SIDE,
+    SCENE_MIN_BRIGHTNESS,
+    SCENE_MIN_SHARPNESS,
+    SCENE_SIMILARITY_THRESHOLD,
+    SCENE_MAX_BLOCK_DIFF,
+    SCENE_CACHE_SIZE,
+    SCENE_CACHE_TTL,
+)
+from utils.scheduler import scheduler
+
+# OpenCV se usa para el filtro local (luz, nitidez), la huella de la escena y la reducción de tamaño
+try:
+    import cv2
+    from vision.imagehash import perceptual_hash, hash_distance, scene_thumbnail, block_difference
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    print("OpenCV no disponible - descripción de escenas sin filtro local ni caché")
+
+DESCRIBE_PROMPT = (
+    "Describe esta escena para una persona ciega, en español y en pocas frases. "
+    "Menciona primero lo más importante: personas, obstáculos, puertas, escalones y texto visible. "
+    "Indica la posición de los objetos (izquierda, derecha, al frente). No agregues comentarios adicionales."
+)
+
+TOO_DARK_MESSAGE = "La imagen está muy oscura. Enciende la luz o apunta la cámara hacia una zona iluminada."
+TOO_BLURRY_MESSAGE = "La imagen salió borrosa. Mantén la cámara quieta e intenta de nuevo."
+
+
+def check_scene_quality(gray):
+    """Filtro local antes de subir la imagen. Retorna un mensaje si no vale la pena describirla"""
+    if float(gray.mean()) < SCENE_MIN_BRIGHTNESS:
+        return TOO_DARK_MESSAGE
+    # Varianza del Laplaciano: valores bajos indican una imagen movida o desenfocada
+    if float(cv2.Laplacian(gray, cv2.CV_64F).var()) < SCENE_MIN_SHARPNESS:
+        return TOO_BLURRY_MESSAGE
+    return None
+
+
+def _downscale(image):
+    """Reduce la imagen al tamaño que usa el modo de detalle bajo de la API"""
+    height, width = image.shape[:2]
+    scale = SCENE_IMAGE_MAX_SIDE / max(height, width)
+    if scale < 1.0:
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    if not ok:
+        raise ValueError("No se pudo codificar la imagen")
+    return buffer.tobytes()
+
+
+class SceneCache:
+    """Descripciones recientes indexadas por huella de la escena (hash perceptual y miniatura).
+
+    El hash descarta rápido las escenas distintas; la miniatura por zonas confirma que no
+    apareció un objeto pequeño (una silla, una caja) que el hash global no alcanza a ver.
+    """
+
+    def __init__(self, size=SCENE_CACHE_SIZE, ttl=SCENE_CACHE_TTL, threshold=SCENE_SIMILARITY_THRESHOLD,
+                 max_block_diff=SCENE_MAX_BLOCK_DIFF):
+        self.size = size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_block_diff = max_block_diff
+        self.entries = OrderedDict()  # id -> ((hash, miniatura), descripción, momento)
+        self.last_id = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _matches(self, entry_id, fingerprint, now):
+        (entry_hash, entry_thumb), _, created = self.entries[entry_id]
+        scene_hash, thumb = fingerprint
+        return (now - created <= self.ttl
+                and hash_distance(scene_hash, entry_hash) <= self.threshold
+                and block_difference(thumb, entry_thumb) <= self.max_block_diff)
+
+    def lookup(self, fingerprint):
+        """Retorna (descripción, segundos desde que se generó) o None"""
+        now = time.monotonic()
+        with self._lock:
+            # Lo más común es volver a preguntar por la última escena
+            candidates = [self.last_id] if self.last_id in self.entries else []
+            candidates += [i for i in reversed(self.entries) if i != self.last_id]
+            for entry_id in candidates:
+                if self._matches(entry_id, fingerprint, now):
+                    self.entries.move_to_end(entry_id)
+                    self.last_id = entry_id
+                    _, description, created = self.entries[entry_id]
+                    return description, now - created
+        return None
+
+    def store(self, fingerprint, description):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.entries[entry_id] = (fingerprint, description, time.monotonic())
+            self.last_id = entry_id
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.last_id = None
+
+
+scene_cache = SceneCache()
+
+
+def prepare_scene(image_path):
+    """Etapa local: filtro de calidad, huella de la escena y reducción de tamaño.
+
+    Retorna (mensaje, huella, jpeg). Si `mensaje` no es None, no se debe subir la imagen.
+    """
+    if not CV2_AVAILABLE:
+        with open(image_path, "rb") as img:
+            return None, None, img.read()
+
+    image = cv2.imread(str(image_path))
+    if image is None:
+        raise FileNotFoundError(image_path)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    message = check_scene_quality(gray)
+    if message:
+        return message, None, None
+    return None, (perceptual_hash(gray), scene_thumbnail(gray)), _downscale(image)
+
+
+def describe_scene(image_path):
+    """Describe la escena de una imagen usando la caché local o la API de OpenAI"""
+    if not OPENAI_API_KEY:
+        return "Error: No se encontró la clave API de OpenAI."
+
+    try:
+        message, fingerprint, jpeg = prepare_scene(image_path)
+        if message:
+            print(f"Escena descartada por el filtro local: {message}")
+            return message
+
+        if fingerprint is not None:
+            cached = scene_cache.lookup(fingerprint)
+            if cached:
+                description, age = cached
+                print(f"Descripción tomada de la caché (escena sin cambios, hace {age:.0f}s)")
+                # Avisar que no es una descripción nueva: la escena pudo cambiar en detalles
+                return f"La escena parece igual que hace {age:.0f} segundos. {description}"
+
+        url = f"{OPENAI_API_BASE}/chat/completions"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {OPENAI_API_KEY}"
+        }
+
+        data = {
+            "model": SCENE_MODEL,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": DESCRIBE_PROMPT},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('utf-8')}",
+                                "detail": "low"
+                            }
+                        }
+                    ]
+                }
+            ],
+            "max_tokens": 300
+        }
+
+        response = scheduler.call(
+            "openai-scene",
+            lambda timeout: requests.post(url, headers=headers, json=data, timeout=timeout),
+            SCENE_DEADLINE,
+            breaker="openai",
+            hedge=False,  # Subir la foto dos veces duplica el costo
+        )
+
+        if response.status_code == 200:
+            description = response.json()["choices"][0]["message"]["content"].strip()
+            print(f"Descripción de la escena: {description}")
+            if fingerprint is not None and description:
+                scene_cache.store(fingerprint, description)
+            return description
+        else:
+            print(f"Error en API OpenAI para descripción: {response.status_code}")
+            print(f"Respuesta: {response.text}")
+            return "Error al describir la escena con inteligencia artificial."
+
+    except FileNotFoundError:
+        return "Error: No se pudo encontrar el archivo de imagen."
+    except requests.exceptions.RequestException as e:
+        print(f"Error de conexión en descripción OpenAI: {e}")
+        return "Error de conexión al servicio de descripción de escenas."
+    except Exception as e:
+        print(f"Error inesperado en describe_scene: {e}")
+        return "Error inesperado al describir la escena."
+
+
+def benchmark_describe(image_path, iterations=50, port=8767, api_delay=0.8):
+    """Mide la etapa local y la latencia completa (API simulada y caché)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    if not CV2_AVAILABLE:
+        print("El benchmark requiere OpenCV")
+        return
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        prepare_scene(image_path)
+    local_ms = (time.perf_counter() - start) * 1000 / iterations
+    message, _, jpeg = prepare_scene(image_path)
+    original_kb = os.path.getsize(image_path) / 1024
+    print(f"Etapa local: {local_ms:.1f} ms por imagen")
+    if message:
+        print(f"La imagen no pasa el filtro local: {message}")
+        return
+    print(f"Tamaño subido: {len(jpeg) / 1024:.0f} KB (original {original_kb:.0f} KB)")
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(api_delay)  # Latencia típica de la API
+            payload = json.dumps({
+                "choices": [{"message": {"content": "Una mesa al frente con una taza a la derecha."}}]
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    global OPENAI_API_BASE, OPENAI_API_KEY
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    OPENAI_API_BASE = f"http://127.0.0.1:{port}"
+    OPENAI_API_KEY = OPENAI_API_KEY or "stub"
+    scene_cache.clear()
+
+    try:
+        start = time.perf_counter()
+        describe_scene(image_path)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        describe_scene(image_path)
+        warm_ms = (time.perf_counter() - start) * 1000
+    finally:
+        server.shutdown()
+
+    print(f"Extremo a extremo sin caché: {cold_ms:.0f} ms (API simulada de {api_delay * 1000:.0f} ms)")
+    print(f"Extremo a extremo con caché: {warm_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python vision/describe.py <imagen>")
+        sys.exit(1)
+    benchmark_describe(sys.argv[1])
@@ -1,61 +1,366 @@
+import os
+import re
+import sys
+import json
+import time
 import base64
+import threading
 import requests
-from config import OPENAI_API_KEY
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_API_BASE,
+    OCR_MODEL,
+    OCR_TILE_MAX_HEIGHT,
+    OCR_TILE_OVERLAP,
+    OCR_MIN_TOKENS,
+    OCR_MAX_TOKENS,
+    OCR_DEFAULT_TOKENS,
+    OCR_PRICE_INPUT_PER_1M,
+    OCR_PRICE_OUTPUT_PER_1M,
+    OCR_DEADLINE,
+)
+from utils.scheduler import scheduler
+
+# OpenCV se usa para dividir páginas grandes y estimar la densidad de texto
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    print("OpenCV no disponible - OCR sin fragmentación ni estimación de tokens")
+
+# Tesseract es el OCR local de respaldo cuando la API no está disponible
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+OCR_PROMPT = "Extrae todo el texto visible en esta imagen. Devuelve únicamente el texto sin comentarios adicionales, manteniendo el formato y estructura original cuando sea posible."
+
+TILES_PROMPT = (
+    "Las {count} imágenes son fragmentos consecutivos de una misma página, de arriba hacia abajo, "
+    "y se solapan ligeramente. Extrae todo el texto visible de cada fragmento. Antes del texto de "
+    "cada fragmento escribe una línea con el marcador [[{marker} N]], donde N es el número del "
+    "fragmento empezando en 1. Devuelve únicamente el texto sin comentarios adicionales."
+)
+TILE_MARKER = "FRAGMENTO"
+_TILE_MARKER_RE = re.compile(r"^\s*\[\[" + TILE_MARKER + r"\s+(\d+)\]\]\s*$", re.MULTILINE)
+
+# Espacio reservado por fragmento para el marcador y saltos de línea
+_TOKENS_PER_TILE_OVERHEAD = 16
+# Caracteres por token aproximados para texto en español
+_CHARS_PER_TOKEN = 3.5
+# Margen sobre la estimación: error del conteo y variación de caracteres por token
+_TOKEN_MARGIN = 1.5
+
+
+class OCRError(Exception):
+    """El OCR no pudo extraer texto; el mensaje se puede leer en voz alta"""
+
+
+class OCRStats:
+    """Contadores acumulados de uso de tokens y costo del OCR"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.reads = 0
+        self.tiles = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.reserved_tokens = 0
+        self.truncated = 0
+        self.cost = 0.0
+
+    def record(self, tiles, reserved, usage, truncated):
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+        cost = (prompt * OCR_PRICE_INPUT_PER_1M + completion * OCR_PRICE_OUTPUT_PER_1M) / 1_000_000
+        with self._lock:
+            self.reads += 1
+            self.tiles += tiles
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+            self.reserved_tokens += reserved
+            self.truncated += int(truncated)
+            self.cost += cost
+        print(f"OCR: {tiles} fragmento(s) | tokens: {prompt} entrada, {completion}/{reserved} salida | "
+              f"costo: ${cost:.5f}{' | TRUNCADO' if truncated else ''}")
+        return cost
+
+    def summary(self):
+        with self._lock:
+            return {
+                "reads": self.reads,
+                "tiles": self.tiles,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "reserved_tokens": self.reserved_tokens,
+                "truncated": self.truncated,
+                "cost": round(self.cost, 6),
+            }
+
+
+ocr_stats = OCRStats()
+
+
+def estimate_chars(gray):
+    """Estima los caracteres de la imagen: glifos más un espacio o salto de línea por palabra"""
+    # Reducir solo imágenes muy grandes: con más reducción las letras se funden entre sí
+    height, width = gray.shape[:2]
+    scale = min(1.0, 2000 / max(width, 1))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return 0
+
+    # Descartar ruido (muy pequeño) y manchas grandes (fotos, bordes, sombras)
+    max_area = binary.shape[0] * binary.shape[1] * 0.01
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    keep = (areas >= 4) & (areas <= max_area)
+    if not keep.any():
+        return 0
+
+    # Letras pegadas forman un solo componente: contar uno por cada ~0.6 alturas de letra de ancho
+    letter_height = float(np.median(stats[1:, cv2.CC_STAT_HEIGHT][keep]))
+    widths = stats[1:, cv2.CC_STAT_WIDTH][keep]
+    glyphs = int(np.maximum(1, np.round(widths / (0.6 * letter_height))).sum())
+
+    # Palabras: unir glifos separados por menos de ~0.6 alturas de letra
+    lut = np.zeros(count, np.uint8)
+    lut[1:][keep] = 255
+    kernel = np.ones((1, max(3, int(letter_height * 0.6))), np.uint8)
+    words = cv2.connectedComponents(cv2.dilate(lut[labels], kernel))[0] - 1
+    return glyphs + words
+
+
+def estimate_tokens(gray):
+    """Estima los tokens de salida a partir de los caracteres visibles"""
+    return int(estimate_chars(gray) / _CHARS_PER_TOKEN * _TOKEN_MARGIN)
+
+
+def _split_tiles(image):
+    """Divide la imagen en franjas horizontales solapadas, de arriba hacia abajo"""
+    height = image.shape[0]
+    if height <= OCR_TILE_MAX_HEIGHT:
+        return [image]
+
+    tiles = []
+    step = OCR_TILE_MAX_HEIGHT - OCR_TILE_OVERLAP
+    top = 0
+    while top < height:
+        bottom = min(top + OCR_TILE_MAX_HEIGHT, height)
+        tiles.append(image[top:bottom])
+        if bottom == height:
+            break
+        top += step
+    return tiles
+
+
+def prepare_ocr_request(image_path):
+    """Prepara los fragmentos codificados en base64 y el presupuesto de max_tokens"""
+    if not CV2_AVAILABLE:
+        with open(image_path, "rb") as img:
+            return [base64.b64encode(img.read()).decode("utf-8")], OCR_DEFAULT_TOKENS
+
+    image = cv2.imread(str(image_path))
+    if image is None:
+        raise FileNotFoundError(image_path)
+
+    encoded = []
+    estimated = 0
+    for tile in _split_tiles(image):
+        ok, buffer = cv2.imencode(".jpg", tile, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise ValueError("No se pudo codificar el fragmento de imagen")
+        encoded.append(base64.b64encode(buffer.tobytes()).decode("utf-8"))
+        estimated += estimate_tokens(cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)) + _TOKENS_PER_TILE_OVERHEAD
+
+    max_tokens = max(OCR_MIN_TOKENS, min(OCR_MAX_TOKENS, estimated))
+    return encoded, max_tokens
+
+
+def _build_payload(encoded_tiles, max_tokens):
+    if len(encoded_tiles) == 1:
+        prompt = OCR_PROMPT
+    else:
+        prompt = TILES_PROMPT.format(count=len(encoded_tiles), marker=TILE_MARKER)
+
+    content = [{"type": "text", "text": prompt}]
+    for encoded in encoded_tiles:
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{encoded}"
+            }
+        })
+
+    return {
+        "model": OCR_MODEL,
+        "messages": [{"role": "user", "content": content}],
+        "max_tokens": max_tokens
+    }
+
+
+def reassemble_tiles(text, tile_count):
+    """Ordena el texto de cada fragmento y elimina líneas repetidas en los solapamientos"""
+    if tile_count == 1:
+        return text.strip()
+
+    parts = _TILE_MARKER_RE.split(text)
+    if len(parts) < 3:
+        # El modelo no usó los marcadores: devolver el texto tal cual
+        return text.strip()
+
+    sections = {}
+    for index in range(1, len(parts) - 1, 2):
+        sections[int(parts[index])] = parts[index + 1].strip()
+
+    lines = []
+    for number in sorted(sections):
+        tile_lines = sections[number].splitlines()
+        # La línea en el solapamiento aparece al final de un fragmento y al inicio del siguiente
+        while tile_lines and lines and tile_lines[0].strip() and tile_lines[0].strip() == lines[-1].strip():
+            tile_lines.pop(0)
+        lines.extend(tile_lines)
+    return "\n".join(lines).strip()
+
+
+def _ocr_with_tesseract(image_path, error_message):
+    """OCR local con Tesseract; lanza OCRError(`error_message`) si no está disponible"""
+    if not TESSERACT_AVAILABLE:
+        raise OCRError(error_message)
+    try:
+        print("Usando Tesseract como OCR local de respaldo...")
+        return pytesseract.image_to_string(str(image_path), lang="spa").strip()
+    except Exception as e:
+        print(f"Error en OCR con Tesseract: {e}")
+        raise OCRError(error_message) from e
+
 
 def ocr_image(image_path):
-    """Extrae texto de una imagen usando la API de OpenAI GPT-4 Vision"""
+    """Extrae texto de una imagen; si falla retorna el mensaje de error para leerlo al usuario"""
+    try:
+        return extract_text(image_path)
+    except OCRError as e:
+        return str(e)
+
+
+def extract_text(image_path):
+    """Extrae texto de una imagen usando la API de OpenAI GPT-4 Vision. Lanza OCRError si falla"""
     if not OPENAI_API_KEY:
-        return "Error: No se encontró la clave API de OpenAI."
-    
+        raise OCRError("Error: No se encontró la clave API de OpenAI.")
+
     try:
-        with open(image_path, "rb") as img:
-            encoded = base64.b64encode(img.read()).decode("utf-8")
-        
-        url = "https://api.openai.com/v1/chat/completions"
+        encoded_tiles, max_tokens = prepare_ocr_request(image_path)
+        retried = False
+
+        url = f"{OPENAI_API_BASE}/chat/completions"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {OPENAI_API_KEY}"
         }
-        
-        data = {
-            "model": "gpt-4.1-mini",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text", 
-                            "text": "Extrae todo el texto visible en esta imagen. Devuelve únicamente el texto sin comentarios adicionales, manteniendo el formato y estructura original cuando sea posible."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{encoded}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 500
-        }
 
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        
-        if response.status_code == 200:
+        while True:
+            data = _build_payload(encoded_tiles, max_tokens)
+            response = scheduler.call(
+                "openai-ocr",
+                lambda timeout: requests.post(url, headers=headers, json=data, timeout=timeout),
+                OCR_DEADLINE,
+                breaker="openai",
+                hedge=False,  # Subir la página dos veces duplica el costo
+            )
+
+            if response.status_code != 200:
+                print(f"Error en API OpenAI para OCR: {response.status_code}")
+                print(f"Respuesta: {response.text}")
+                return _ocr_with_tesseract(image_path, "Error al extraer texto con inteligencia artificial.")
+
             result = response.json()
-            text = result["choices"][0]["message"]["content"]
-            print(f"Texto extraído con OpenAI: {text}")
-            return text.strip()
-        else:
-            print(f"Error en API OpenAI para OCR: {response.status_code}")
-            print(f"Respuesta: {response.text}")
-            return "Error al extraer texto con inteligencia artificial."
-            
+            choice = result["choices"][0]
+            truncated = choice.get("finish_reason") == "length"
+            ocr_stats.record(len(encoded_tiles), max_tokens, result.get("usage", {}), truncated)
+            # Un solo reintento con el doble de tokens si la respuesta quedó cortada
+            if not truncated or retried or max_tokens >= OCR_MAX_TOKENS:
+                break
+            retried = True
+            max_tokens = min(OCR_MAX_TOKENS, max_tokens * 2)
+            print(f"Respuesta de OCR truncada, reintentando con max_tokens={max_tokens}")
+
+        text = reassemble_tiles(choice["message"]["content"], len(encoded_tiles))
+        print(f"Texto extraído con OpenAI: {text}")
+        return text
+
+    except OCRError:
+        raise
     except FileNotFoundError:
-        return "Error: No se pudo encontrar el archivo de imagen."
+        raise OCRError("Error: No se pudo encontrar el archivo de imagen.")
     except requests.exceptions.RequestException as e:
         print(f"Error de conexión en OCR OpenAI: {e}")
-        return "Error de conexión al servicio de extracción de texto."
+        return _ocr_with_tesseract(image_path, "Error de conexión al servicio de extracción de texto.")
     except Exception as e:
-        print(f"Error inesperado en ocr_image_openai: {e}")
-        return "Error inesperado al extraer texto de la imagen."
+        print(f"Error inesperado en extract_text: {e}")
+        raise OCRError("Error inesperado al extraer texto de la imagen.") from e
+
+
+def benchmark_ocr(image_path, reads=20, port=8765):
+    """Mide lecturas por segundo y costo contra un servidor local que imita la API"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            images = [c for c in request["messages"][0]["content"] if c["type"] == "image_url"]
+            # Respuesta con marcadores por fragmento y uso de tokens proporcional al tamaño
+            body = "\n".join(f"[[{TILE_MARKER} {i + 1}]]\nlínea {i + 1}" for i in range(len(images)))
+            completion = min(request["max_tokens"], 40 * len(images))
+            payload = json.dumps({
+                "choices": [{"message": {"content": body}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 85 + 765 * len(images), "completion_tokens": completion},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    global OPENAI_API_BASE, OPENAI_API_KEY
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    OPENAI_API_BASE = f"http://127.0.0.1:{port}"
+    OPENAI_API_KEY = OPENAI_API_KEY or "stub"
+    ocr_stats.reset()
+
+    try:
+        start = time.perf_counter()
+        for _ in range(reads):
+            ocr_image(image_path)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    summary = ocr_stats.summary()
+    print(f"\nLecturas: {reads} en {elapsed:.2f}s ({reads / elapsed:.1f} lecturas/s)")
+    print(f"Contadores: {summary}")
+    print(f"Costo promedio por lectura: ${summary['cost'] / reads:.5f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python vision/ocr.py <imagen>")
+        sys.exit(1)
+    benchmark_ocr(sys.argv[1])
@@ -0,0 +1,235 @@
+import os
+import sys
+import time
+import queue
+import difflib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio padre al path para poder importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    COMMAND_LATENCY_BUDGET,
+    IMAGE_EXPECTED_SIZE,
+    READING_SAMPLE_INTERVAL,
+    READING_IDLE_TIMEOUT,
+    READING_PAGE_CHANGE_THRESHOLD,
+    READING_MAX_PAGES,
+)
+from vision.camera import take_picture
+from vision.ocr import OCRError, extract_text
+from utils.temp_files import temp_manager
+from utils.scheduler import scheduler
+
+# OpenCV se usa para detectar cambios de página (firma de la tinta de la hoja)
+try:
+    from vision.imagehash import page_signature, signature_distance
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    print("OpenCV no disponible - lectura continua deshabilitada")
+
+_END = object()
+
+
+def _normalize_line(line):
+    return " ".join(line.lower().split())
+
+
+class LineDeduplicator:
+    """Elimina las líneas que ya estaban en la página anterior (solapamiento entre capturas).
+
+    Solo se compara con la página anterior: líneas que se repiten legítimamente en
+    páginas posteriores (totales, despedidas, filas de tablas) sí se leen.
+    """
+
+    def __init__(self, similarity=0.9):
+        self.similarity = similarity
+        self.previous = []
+        self._previous_set = set()
+
+    def _seen(self, norm):
+        return norm in self._previous_set or any(
+            difflib.SequenceMatcher(None, norm, old).ratio() >= self.similarity for old in self.previous
+        )
+
+    def new_text(self, text):
+        """Retorna solo las líneas de `text` que no estaban en la página anterior"""
+        lines = [(line.strip(), _normalize_line(line)) for line in text.splitlines()]
+        fresh = [line for line, norm in lines if norm and not self._seen(norm)]
+        self.previous = [norm for _, norm in lines if norm]
+        self._previous_set = set(self.previous)
+        return "\n".join(fresh)
+
+
+class ReadingActivity:
+    """Páginas enviadas a OCR que aún no se terminan de leer, y momento de la última actividad"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.last_activity = time.monotonic()
+
+    def page_submitted(self):
+        with self._lock:
+            self.pending += 1
+            self.last_activity = time.monotonic()
+
+    def page_spoken(self):
+        with self._lock:
+            self.pending -= 1
+            self.last_activity = time.monotonic()
+
+    def idle_for(self):
+        """Segundos sin actividad; 0 mientras quede alguna página por leer"""
+        with self._lock:
+            return 0.0 if self.pending else time.monotonic() - self.last_activity
+
+
+class PageChangeDetector:
+    """Detecta cuándo hay una página nueva y estable frente a la cámara"""
+
+    def __init__(self, threshold=READING_PAGE_CHANGE_THRESHOLD):
+        self.threshold = threshold
+        self.last_frame = None
+        self.last_page = None
+
+    def is_new_page(self, signature):
+        """Una página es nueva si difiere de la última leída y coincide con el cuadro anterior"""
+        stable = (self.last_frame is not None
+                  and signature_distance(signature, self.last_frame) <= self.threshold)
+        self.last_frame = signature
+        if not stable:
+            return False
+        if self.last_page is not None and signature_distance(signature, self.last_page) <= self.threshold:
+            return False
+        self.last_page = signature
+        return True
+
+
+def camera_frames(interval=READING_SAMPLE_INTERVAL):
+    """Genera capturas periódicas de la cámara.
+
+    Cada captura se libera al pedir la siguiente; quien necesite conservarla debe llamar a acquire().
+    """
+    while True:
+        frame = temp_manager.create(".jpg", expected_size=IMAGE_EXPECTED_SIZE)
+        try:
+            if take_picture(frame.path):
+                yield frame
+        finally:
+            frame.release()
+        time.sleep(interval)
+
+
+def _speak_page(speak, number, future, dedup):
+    """Lee las líneas nuevas de una página, o avisa si su OCR falló"""
+    try:
+        text = future.result()
+    except OCRError as e:
+        speak(f"No pude leer la página {number}. {e}")
+        return
+    fresh = dedup.new_text(text or "")
+    if fresh.strip():
+        speak(f"Página {number}. {fresh}")
+    else:
+        print(f"Página {number} sin texto nuevo")
+
+
+def read_continuous(speak, frames=None, idle_timeout=READING_IDLE_TIMEOUT, max_pages=READING_MAX_PAGES):
+    """Lee páginas de forma continua: el OCR de la siguiente página se ejecuta mientras se habla la actual.
+
+    Retorna el número de páginas leídas.
+    """
+    if not CV2_AVAILABLE:
+        speak("La lectura continua requiere OpenCV.")
+        return 0
+
+    if frames is None:
+        frames = camera_frames()
+
+    pages = queue.Queue()
+    stop_event = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+    # El tiempo de espera cuenta desde que se termina de leer la última página, no desde su captura
+    activity = ReadingActivity()
+
+    def capture_loop():
+        """Toma cuadros y envía a OCR solo las páginas nuevas"""
+        detector = PageChangeDetector()
+        submitted = 0
+        try:
+            for frame in frames:
+                if stop_event.is_set():
+                    break
+                signature = page_signature(frame.path)
+                if signature is None:
+                    continue
+                if detector.is_new_page(signature):
+                    # Conservar la captura hasta que termine su OCR
+                    frame.acquire()
+                    activity.page_submitted()
+                    pages.put((frame, executor.submit(extract_text, str(frame.path))))
+                    submitted += 1
+                    if max_pages and submitted >= max_pages:
+                        break
+                elif activity.idle_for() > idle_timeout:
+                    break
+        except Exception as e:
+            print(f"Error capturando páginas: {e}")
+        finally:
+            pages.put(_END)
+
+    capture_thread = threading.Thread(target=capture_loop, daemon=True)
+    capture_thread.start()
+
+    dedup = LineDeduplicator()
+    read_pages = 0
+    try:
+        while True:
+            item = pages.get()
+            if item is _END:
+                break
+            page, future = item
+            read_pages += 1
+            try:
+                # Presupuesto por página: una lectura larga no agota el de las siguientes
+                with scheduler.budget(COMMAND_LATENCY_BUDGET):
+                    _speak_page(speak, read_pages, future, dedup)
+            finally:
+                page.release()
+                activity.page_spoken()
+    finally:
+        stop_event.set()
+        capture_thread.join(timeout=1)
+        executor.shutdown(wait=False)
+
+    return read_pages
+
+
+def benchmark_pages(fixture_dir, repeat_frames=2):
+    """Mide páginas por minuto usando imágenes de un directorio como cuadros de la cámara"""
+    images = sorted(p for p in Path(fixture_dir).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    if not images:
+        print(f"No hay imágenes en {fixture_dir}")
+        return
+
+    # Cada imagen se repite para simular una página estable frente a la cámara
+    frames = [temp_manager.wrap(p) for p in images for _ in range(repeat_frames)]
+    spoken = []
+
+    start = time.perf_counter()
+    read_pages = read_continuous(spoken.append, frames=iter(frames), idle_timeout=float("inf"), max_pages=0)
+    elapsed = time.perf_counter() - start
+
+    print(f"Páginas leídas: {read_pages} de {len(images)}")
+    print(f"Tiempo total: {elapsed:.2f}s | {read_pages / elapsed * 60:.1f} páginas/minuto")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python vision/reader.py <directorio_de_imagenes>")
+        sys.exit(1)
+    benchmark_pages(sys.argv[1])